@@ -0,0 +1,133 @@
+import atexit
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+class EmbeddingCache:
+    """
+    查询特征缓存 (LRU + 可选 TTL + 可选磁盘持久化)
+    图片内容哈希 -> 提取出的人脸列表，重复查询同一张图时跳过检测与识别
+    """
+
+    def __init__(self, max_size=256, ttl=0, path=None, save_interval=60):
+        """
+        :param max_size: 最多缓存的图片数量，超出后淘汰最久未使用的
+        :param ttl: 过期时间 (秒)，0 表示永不过期
+        :param path: 持久化文件路径，None 表示只缓存在内存中
+        :param save_interval: 落盘最小间隔 (秒)，进程退出时也会落盘一次
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self.save_interval = save_interval
+
+        self._items = OrderedDict()  # key -> (写入时间, faces)
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.time()
+        self.hits = 0
+        self.misses = 0
+
+        self.load()
+        if self.path:
+            atexit.register(self.save)
+
+    @staticmethod
+    def make_key(img, model_name, det_size):
+        """
+        缓存键: 模型名 + 检测尺寸 + 解码后图片内容的哈希
+        更换模型或检测尺寸后旧缓存自然失效
+        """
+        digest = hashlib.sha1(img.tobytes())
+        digest.update(str((img.shape, str(img.dtype))).encode())
+        return f"{model_name}|{det_size[0]}x{det_size[1]}|{digest.hexdigest()}"
+
+    def get(self, key):
+        """命中返回人脸列表，未命中或已过期返回 None"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and self.ttl and time.time() - entry[0] > self.ttl:
+                del self._items[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, faces):
+        """写入缓存 (配置了持久化路径时，距上次落盘超过 save_interval 才落盘)"""
+        with self._lock:
+            self._items[key] = (time.time(), faces)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            self._dirty = True
+
+        if self.path and time.time() - self._last_save >= self.save_interval:
+            self.save()
+
+    def stats(self):
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._items),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def load(self):
+        """从磁盘恢复缓存 (文件不存在或损坏时忽略)"""
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path, 'rb') as f:
+                items = pickle.load(f)
+        except Exception as e:
+            print(f"[Cache] 缓存文件读取失败，已忽略: {e}")
+            return
+
+        with self._lock:
+            self._items = OrderedDict(items)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def save(self):
+        """写入磁盘 (写入唯一的临时文件再替换，多线程同时落盘时串行执行)"""
+        if not self.path or not self._dirty:
+            return
+
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return  # 已被其他线程落盘
+                items = list(self._items.items())
+                self._dirty = False
+                self._last_save = time.time()
+
+            out_dir = os.path.dirname(self.path) or "."
+            os.makedirs(out_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    pickle.dump(items, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
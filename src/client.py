@@ -0,0 +1,146 @@
+import http.client
+import json
+import os
+import socket
+import uuid
+from urllib.parse import urlencode
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """通过 unix socket 连接本机 server.py"""
+
+    def __init__(self, uds, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.uds = uds
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.uds)
+
+
+class SearchClient:
+    """
+    轻量客户端: 把搜索请求转发给常驻的 server.py，
+    命令行脚本无需加载模型和数据库即可得到结果
+    """
+
+    def __init__(self, host="127.0.0.1", port=8000, uds=None, timeout=30):
+        self.host = host
+        self.port = port
+        self.uds = uds
+        self.timeout = timeout
+
+    def _connect(self, timeout):
+        if self.uds:
+            return UnixHTTPConnection(self.uds, timeout=timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _request(self, method, path, params=None, body=None, headers=None, timeout=None):
+        if params:
+            path = f"{path}?{urlencode(params)}"
+
+        conn = self._connect(timeout or self.timeout)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            data = resp.read()
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {data[:200]!r}")
+            return json.loads(data)
+        finally:
+            conn.close()
+
+    def _upload(self, path, image_path, params):
+        """以 multipart/form-data 上传图片"""
+        body, headers = self._multipart(image_path)
+        return self._request("POST", path, params=params, body=body, headers=headers)
+
+    def _upload_stream(self, path, image_path, params):
+        """上传图片并逐行读取 NDJSON 响应"""
+        body, headers = self._multipart(image_path)
+        conn = self._connect(self.timeout)
+        try:
+            conn.request("POST", f"{path}?{urlencode(params)}", body=body, headers=headers)
+            resp = conn.getresponse()
+            if resp.status != 200:
+                raise RuntimeError(f"HTTP {resp.status}: {resp.read()[:200]!r}")
+            for line in resp:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _multipart(image_path):
+        """构造 multipart/form-data 请求体"""
+        with open(image_path, 'rb') as f:
+            file_bytes = f.read()
+
+        boundary = uuid.uuid4().hex
+        file_name = os.path.basename(image_path)
+        body = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; filename="{file_name}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + file_bytes + f"\r\n--{boundary}--\r\n".encode()
+
+        headers = {"Content-Type": f"multipart/form-data; boundary={boundary}"}
+        return body, headers
+
+    @staticmethod
+    def _check_file(image_path):
+        """与本地模式一致: 文件不存在时打印错误并返回空结果"""
+        if not os.path.exists(image_path):
+            print(f"[Error] File not found: {image_path}")
+            return False
+        return True
+
+    @staticmethod
+    def _window(since, until):
+        """时间窗口参数 (未指定的不传)"""
+        return {k: v for k, v in (("since", since), ("until", until)) if v}
+
+    def is_alive(self, timeout=0.5):
+        """探测服务是否在运行"""
+        try:
+            return self._request("GET", "/health", timeout=timeout).get("status") == "ok"
+        except (OSError, RuntimeError, ValueError, http.client.HTTPException):
+            # 端口上不是本服务 (或根本不是 HTTP) 时同样视为不可用
+            return False
+
+    def search(self, image_path, limit=5, level="auto", threshold=0.67, project="default_project",
+               since=None, until=None):
+        """同 Searcher.search"""
+        if not self._check_file(image_path):
+            return []
+        params = {"limit": limit, "level": level, "threshold": threshold, "project": project}
+        params.update(self._window(since, until))
+        return self._upload("/search", image_path, params)["data"]
+
+    def iter_range(self, image_path, threshold=0.67, level="auto", project="default_project", batch_size=100,
+                   since=None, until=None):
+        """同 Searcher.iter_range，通过流式接口边查边返回 (服务端按批翻倍，无需按页重复查询)"""
+        if not self._check_file(image_path):
+            return
+        params = {"threshold": threshold, "level": level, "project": project, "batch_size": batch_size}
+        params.update(self._window(since, until))
+        yield from self._upload_stream("/search/stream", image_path, params)
+
+
+def connect(config):
+    """
+    根据配置探测本机是否有 server.py 在运行
+    :return: 可用的 SearchClient，服务不可用时返回 None (调用方回退到本地模式)
+    """
+    server_cfg = config.get('server', {})
+    host = server_cfg.get('host', '127.0.0.1')
+    if host in ("0.0.0.0", ""):
+        host = "127.0.0.1"  # 监听所有网卡时，本机通过回环地址访问
+
+    uds = server_cfg.get('uds')
+    if uds and not os.path.exists(uds):
+        uds = None
+
+    client = SearchClient(host=host, port=server_cfg.get('port', 8000), uds=uds)
+    return client if client.is_alive() else None
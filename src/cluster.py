@@ -0,0 +1,37 @@
+import argparse
+from database import VectorDB
+from sharding import ShardedDB
+from identity import IdentityIndex
+from utils import load_config
+
+
+def run_cluster(project_name, config_path="config.json"):
+    """对项目内的轨迹级数据做 (增量) 身份聚类，并更新身份索引"""
+    cfg = load_config(config_path)
+    id_cfg = cfg.get('identity_config', {})
+
+    db_path = cfg['project_settings'].get('vector_db_path', 'store/vector_db')
+    if cfg['project_settings'].get('shard_by'):
+        db = ShardedDB(db_path, project_name)  # 遍历全部分片
+    else:
+        db = VectorDB(db_path=db_path, collection_name=project_name)
+
+    index = IdentityIndex(
+        index_dir=id_cfg.get('index_dir', 'store/identity'),
+        project_name=project_name,
+        threshold=id_cfg.get('threshold', 0.55)
+    )
+
+    print(f"[Cluster] 项目: {project_name} | 已索引: {len(index.indexed_ids)} | 身份数: {len(index.postings)}")
+    added = index.update(db, chunk_size=id_cfg.get('chunk_size', 1024))
+    print(f"[Cluster] 新增: {added} | 身份数: {len(index.postings)}")
+    return index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="跨视频身份聚类 (增量)")
+    parser.add_argument("--project", "-p", default="default_project", help="项目名称")
+    parser.add_argument("--config", "-c", default="config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    run_cluster(args.project, args.config)
@@ -1,5 +1,4 @@
 import numpy as np
-from insightface.app import FaceAnalysis
 from utils import l2_normalize
 
 def compute_sim(feat1, feat2):
@@ -11,6 +10,9 @@ class FaceEngine:
         """
         初始化模型
         """
+        # 延迟导入: insightface/onnxruntime 加载较慢，只在真正需要模型时才导入
+        from insightface.app import FaceAnalysis
+
         self.app = FaceAnalysis(name=model_name, providers=["CPUExecutionProvider"])
         self.app.prepare(ctx_id=ctx_id, det_size=det_size)
         print(f"[{model_name}] 模型加载完毕 (ctx_id={ctx_id})")
@@ -1,7 +1,3 @@
-import chromadb
-from chromadb.config import Settings
-
-
 class VectorDB:
     def __init__(self, db_path="store/vector_db", collection_name="default_project"):
         """
@@ -11,7 +7,8 @@ class VectorDB:
         """
         # print(f" -> [DB] 连接向量数据库: {db_path} | 集合: {collection_name}")
 
-        # 初始化客户端
+        # 初始化客户端 (延迟导入 chromadb，只在真正连接数据库时才加载)
+        import chromadb
         self.client = chromadb.PersistentClient(path=db_path)
 
         # 获取或创建集合 (基于传入的项目名称)
@@ -54,10 +51,65 @@ class VectorDB:
         self.buffer_embeddings = []
         self.buffer_metas = []
 
+    def bulk_upsert(self, ids, embeddings, metadatas):
+        """
+        大批量写入 (用于数据导入)，绕过 50 条的缓冲区，按客户端允许的最大批次提交
+        相同 id 的数据会被覆盖，重复导入是安全的
+        """
+        max_batch = len(ids)
+        if hasattr(self.client, 'get_max_batch_size'):
+            max_batch = self.client.get_max_batch_size()
+
+        for start in range(0, len(ids), max_batch):
+            end = start + max_batch
+            self.collection.upsert(
+                ids=ids[start:end],
+                embeddings=embeddings[start:end],
+                metadatas=metadatas[start:end]
+            )
+
     def count(self):
         """返回当前集合的数据总量"""
         return self.collection.count()
 
+    def get_embeddings(self, ids):
+        """按 id 读取特征向量，返回顺序与 ids 一致"""
+        if not ids:
+            return []
+        batch = self.collection.get(ids=list(ids), include=["embeddings"])
+        by_id = dict(zip(batch['ids'], batch['embeddings']))
+        return [by_id[uid] for uid in ids]
+
+    def iter_items(self, where=None, batch_size=1000, include=("embeddings", "metadatas")):
+        """
+        分批遍历集合中的数据 (避免一次性读入全部向量)
+        :param where: 过滤条件字典, 同 search
+        :param batch_size: 每批读取的数量
+        :return: 生成器, 每次产出 {"ids": [...], "embeddings": [...], "metadatas": [...]}
+        """
+        offset = 0
+        while True:
+            batch = self.collection.get(
+                where=where,
+                limit=batch_size,
+                offset=offset,
+                include=list(include)
+            )
+            ids = batch.get('ids') or []
+            if not ids:
+                break
+
+            yield {
+                "ids": ids,
+                "embeddings": batch.get('embeddings'),
+                "metadatas": batch.get('metadatas'),
+                "source": self  # 数据所在的集合 (分片遍历时用于回查)
+            }
+
+            if len(ids) < batch_size:
+                break
+            offset += len(ids)
+
     def search(self, query_embedding, limit=5, where=None):
         """
         在数据库中搜索最相似的人脸
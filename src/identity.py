@@ -0,0 +1,231 @@
+import json
+import os
+import numpy as np
+
+
+def row_key(collection_name, uid):
+    """
+    索引内的数据键: 集合名 + id
+    开启时间分片后同一个 id 可能出现在不同分片中，只用 id 会互相覆盖
+    (集合名只含 [a-zA-Z0-9._-]，用 / 分隔不会冲突)
+    """
+    return f"{collection_name}/{uid}"
+
+
+class IdentityIndex:
+    """
+    身份索引: 将项目内所有轨迹级人脸聚类为身份 (Identity)，
+    并持久化 身份 -> 出现记录 的倒排表，支持增量更新
+    """
+
+    def __init__(self, index_dir="store/identity", project_name="default_project", threshold=0.55):
+        """
+        :param index_dir: 索引文件存放目录
+        :param project_name: 项目名称 (每个项目一份索引)
+        :param threshold: 归入同一身份的最低余弦相似度
+        """
+        self.project_name = project_name
+        self.threshold = threshold
+        self.json_path = os.path.join(index_dir, f"{project_name}.json")
+        self.npy_path = os.path.join(index_dir, f"{project_name}_centroids.npy")
+
+        self.sums = None          # 每个身份的特征向量累加和 (K x D)，归一化后即为中心
+        self.postings = {}        # identity_id(str) -> 出现记录列表
+        self.indexed_ids = set()  # 已入索引的数据键 (row_key)，用于增量更新
+        self._mtime = None
+
+        self.load()
+
+    # ---------------- 持久化 ----------------
+
+    def load(self):
+        """从磁盘加载索引 (文件不存在则为空索引)"""
+        if not os.path.exists(self.json_path):
+            return
+
+        with open(self.json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.postings = data.get('identities', {})
+        self.indexed_ids = set(data.get('indexed_ids', []))
+        if data.get('version', 1) < 2:
+            self._upgrade_v1()
+        self.sums = np.load(self.npy_path) if os.path.exists(self.npy_path) else None
+        self._mtime = os.path.getmtime(self.json_path)
+
+    def refresh(self):
+        """如果磁盘上的索引被离线任务更新过，则重新加载"""
+        if os.path.exists(self.json_path) and os.path.getmtime(self.json_path) != self._mtime:
+            self.load()
+
+    def save(self):
+        """写入磁盘 (先写临时文件再替换，避免读到写了一半的索引)"""
+        os.makedirs(os.path.dirname(self.json_path) or ".", exist_ok=True)
+
+        if self.sums is not None:
+            tmp_npy = self.npy_path + ".tmp.npy"
+            np.save(tmp_npy, self.sums)
+            os.replace(tmp_npy, self.npy_path)
+
+        data = {
+            "version": 2,
+            "project": self.project_name,
+            "threshold": self.threshold,
+            "identities": self.postings,
+            "indexed_ids": sorted(self.indexed_ids)
+        }
+        tmp_json = self.json_path + ".tmp"
+        with open(tmp_json, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_json, self.json_path)
+        self._mtime = os.path.getmtime(self.json_path)
+
+    def _upgrade_v1(self):
+        """
+        旧版索引只记录裸 id: 旧版只支持未分片项目，数据都在项目集合中
+        """
+        for items in self.postings.values():
+            for x in items:
+                x.setdefault('collection', self.project_name)
+        self.indexed_ids = {row_key(self.project_name, uid) for uid in self.indexed_ids}
+
+    # ---------------- 聚类 ----------------
+
+    def _centroids(self):
+        """归一化后的身份中心 (K x D)"""
+        norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+        return self.sums / np.maximum(norms, 1e-12)
+
+    def update(self, db, chunk_size=1024):
+        """
+        增量聚类: 只处理尚未入索引的轨迹级数据
+        先只遍历 id 和元数据，特征向量只为新数据读取
+        :param db: VectorDB / ShardedDB 实例
+        :param chunk_size: 每批读取并做矩阵相似度计算的数量
+        :return: 本次新增入索引的数量
+        """
+        added = 0
+        for batch in db.iter_items(where={"data_level": "track"}, batch_size=chunk_size, include=("metadatas",)):
+            collection_name = batch['source'].collection.name
+            keep = [i for i, uid in enumerate(batch['ids'])
+                    if row_key(collection_name, uid) not in self.indexed_ids]
+            if not keep:
+                continue
+
+            ids = [batch['ids'][i] for i in keep]
+            metas = [batch['metadatas'][i] for i in keep]
+            embs = np.asarray(batch['source'].get_embeddings(ids), dtype=np.float32)
+            embs = embs / np.maximum(np.linalg.norm(embs, axis=1, keepdims=True), 1e-12)
+
+            self._assign_chunk(collection_name, ids, embs, metas)
+            added += len(ids)
+
+        if added:
+            self.save()
+        return added
+
+    def _assign_chunk(self, collection_name, ids, embs, metas):
+        """
+        将一批特征分配到身份:
+        1. 与已有身份中心做一次矩阵乘法，超过阈值的直接归入
+        2. 剩余的在批内做贪心聚类，生成新身份
+        """
+        n = len(ids)
+        labels = np.full(n, -1, dtype=np.int64)
+
+        # 1. 匹配已有身份
+        if self.sums is not None and len(self.sums) > 0:
+            sims = embs @ self._centroids().T
+            best = np.argmax(sims, axis=1)
+            best_sim = sims[np.arange(n), best]
+            matched = best_sim > self.threshold
+            labels[matched] = best[matched]
+
+        # 2. 批内聚类 (以第一个未分配的样本为中心，一次性吸收所有相似样本)
+        rest = np.where(labels == -1)[0]
+        if len(rest) > 0:
+            base_id = 0 if self.sums is None else len(self.sums)
+            next_id = base_id
+            rest_sims = embs[rest] @ embs[rest].T
+            unassigned = np.ones(len(rest), dtype=bool)
+            for i in range(len(rest)):
+                if not unassigned[i]:
+                    continue
+                members = unassigned & (rest_sims[i] > self.threshold)
+                members[i] = True
+                labels[rest[members]] = next_id
+                unassigned &= ~members
+                next_id += 1
+
+            new_rows = np.zeros((next_id - base_id, embs.shape[1]), dtype=np.float32)
+            self.sums = new_rows if self.sums is None else np.vstack([self.sums, new_rows])
+
+        # 3. 更新身份中心 & 倒排表
+        np.add.at(self.sums, labels, embs)
+        for uid, label, meta in zip(ids, labels, metas):
+            self.postings.setdefault(str(label), []).append(self._appearance(collection_name, uid, meta))
+            self.indexed_ids.add(row_key(collection_name, uid))
+
+    @staticmethod
+    def _appearance(collection_name, uid, meta):
+        """倒排表中的单条出现记录"""
+        return {
+            "id": uid,
+            "collection": collection_name,
+            "file_name": meta.get('video_name', 'Unknown'),
+            "frame_id": meta.get('frame_id', 0),
+            "start_time_ms": meta.get('start_time_ms', meta.get('timestamp_ms', 0)),
+            "end_time_ms": meta.get('end_time_ms', meta.get('timestamp_ms', 0)),
+            "bbox": meta.get('bbox', '[0,0,0,0]')
+        }
+
+    def remove_ids(self, collection_name, ids):
+        """
+        从倒排表中移除某个集合中的指定数据 (如过期分片被删除后)，需调用 save 落盘
+        其他分片中的同 id 数据不受影响；身份中心保持不变，保证身份编号稳定
+        """
+        keys = {row_key(collection_name, uid) for uid in ids} & self.indexed_ids
+        if not keys:
+            return 0
+
+        for k in list(self.postings):
+            kept = [x for x in self.postings[k] if row_key(x['collection'], x['id']) not in keys]
+            if kept:
+                self.postings[k] = kept
+            else:
+                del self.postings[k]
+        self.indexed_ids -= keys
+        return len(keys)
+
+    # ---------------- 查询 ----------------
+
+    def get_appearances(self, identity_id):
+        """返回某个身份的全部出现记录 (按文件、时间排序)，纯索引查找"""
+        items = self.postings.get(str(identity_id), [])
+        return sorted(items, key=lambda x: (x['file_name'], x['start_time_ms']))
+
+    def list_identities(self):
+        """返回所有身份的概要 (按出现次数降序)"""
+        summary = [
+            {
+                "identity_id": int(k),
+                "appearances": len(v),
+                "videos": len({x['file_name'] for x in v})
+            }
+            for k, v in self.postings.items()
+        ]
+        return sorted(summary, key=lambda x: x['appearances'], reverse=True)
+
+    def match(self, embedding):
+        """
+        将一个人脸特征匹配到最近的身份
+        :return: (identity_id, similarity)，没有足够相似的身份时 identity_id 为 None
+        """
+        if self.sums is None or len(self.sums) == 0:
+            return None, 0.0
+
+        sims = self._centroids() @ np.asarray(embedding, dtype=np.float32)
+        best = int(np.argmax(sims))
+        best_sim = float(sims[best])
+        if best_sim <= self.threshold:
+            return None, best_sim
+        return best, best_sim
@@ -2,9 +2,10 @@ import argparse
 import os
 from core import FaceEngine
 import processor
+from cluster import run_cluster
 from utils import load_config # <--- 导入 Utils
 
-def run_pipeline(input_path, project_name, config_path="config.json"):
+def run_pipeline(input_path, project_name, config_path="config.json", cluster=False):
     # 使用统一的配置加载
     cfg = load_config(config_path)
 
@@ -12,6 +13,7 @@ def run_pipeline(input_path, project_name, config_path="config.json"):
     print("[System] 初始化模型...")
     engine = FaceEngine(
         model_name=cfg['model_params']['model_name'],
+        det_size=tuple(cfg['model_params'].get('det_size', (640, 640))),  # 与 Searcher 保持一致
     )
 
     # 3. 扫描任务 (识别文件还是文件夹)
@@ -55,13 +57,40 @@ def run_pipeline(input_path, project_name, config_path="config.json"):
 
     print(f"\n[Done] 全部任务完成。成功: {success_count}/{len(tasks)}")
 
+    # 5. 增量更新身份索引 (可选)
+    if cluster and success_count:
+        run_cluster(project_name, config_path)
+
+
+def run_mark_coarse(project_name, config_path="config.json"):
+    """为旧数据补打 coarse 标记，使分级检索能检索到没有轨迹行的图片/单帧"""
+    from database import VectorDB
+    from sharding import ShardedDB
+
+    cfg = load_config(config_path)
+    db_path = cfg['project_settings'].get('vector_db_path', 'store/vector_db')
+    if cfg['project_settings'].get('shard_by'):
+        db = ShardedDB(db_path, project_name)
+    else:
+        db = VectorDB(db_path=db_path, collection_name=project_name)
+
+    count = processor.mark_coarse_frames(db)
+    print(f"[System] 已补打 coarse 标记: {count} 条。项目: {project_name}")
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="视频/图片人脸分析服务 (批量版)")
-    parser.add_argument("--input", "-i", required=True, help="输入文件路径 或 文件夹路径")
+    parser.add_argument("--input", "-i", help="输入文件路径 或 文件夹路径")
     parser.add_argument("--project", "-p", default="default_project", help="项目名称(用于隔离数据库和输出目录)")
     parser.add_argument("--config", "-c", default="config.json", help="配置文件路径")
+    parser.add_argument("--cluster", action="store_true", help="处理完成后增量更新身份索引")
+    parser.add_argument("--mark-coarse", action="store_true", help="迁移旧数据: 为没有轨迹行的图片/单帧补打分级检索标记")
 
     args = parser.parse_args()
 
-    run_pipeline(args.input, args.project, args.config)
\ No newline at end of file
+    if args.mark_coarse:
+        run_mark_coarse(args.project, args.config)
+    elif not args.input:
+        parser.error("需要 --input (或使用 --mark-coarse)")
+    else:
+        run_pipeline(args.input, args.project, args.config, args.cluster)
\ No newline at end of file
@@ -4,7 +4,7 @@ import json
 import time
 import numpy as np
 from utils import round_list
-from database import VectorDB
+from sharding import open_project_db
 from tracker import SmartTracker
 
 
@@ -24,8 +24,7 @@ def process_image(engine, img_path, config, project_name="default_project"):
     out_dir = get_output_dir(config, project_name, img_path)
 
     # 图片通常直接入库，视为微观数据(Frame)
-    db_path = config['project_settings'].get('vector_db_path', 'store/vector_db')
-    db = VectorDB(db_path=db_path, collection_name=project_name)
+    db = open_project_db(config, project_name)
 
     print(f" -> 读取图片: {img_path}")
     img = cv2.imread(img_path)
@@ -51,6 +50,7 @@ def process_image(engine, img_path, config, project_name="default_project"):
         meta = {
             "video_name": file_name,  # 这里复用 video_name 字段存文件名
             "data_level": "frame",  # 图片本质上是单帧
+            "coarse": True,  # 图片没有轨迹行，分级检索 (hierarchical) 的粗排需要直接检索到它
             "frame_id": 0,  # 图片默认为第0帧
             "timestamp_ms": 0,
             "score": float(f["score"]),
@@ -92,14 +92,42 @@ def process_image(engine, img_path, config, project_name="default_project"):
     return json_path
 
 
+def mark_coarse_frames(db):
+    """
+    为没有轨迹行的单帧数据补打 coarse 标记 (迁移旧数据用):
+    分级检索之前入库的图片、全量采集视频都只有 frame 行，不打标记时粗排无法检索到
+    :return: 补打标记的数量
+    """
+    # 1. 收集已有轨迹行的文件
+    tracked = set()
+    for batch in db.iter_items(where={"data_level": "track"}, include=("metadatas",)):
+        tracked.update(m.get('video_name') for m in batch['metadatas'])
+
+    # 2. 先收集再更新，避免边遍历边修改影响分页 (按所在集合分组，兼容分片)
+    pending = {}
+    for batch in db.iter_items(where={"data_level": "frame"}, include=("metadatas",)):
+        source = batch['source']
+        for uid, meta in zip(batch['ids'], batch['metadatas']):
+            if meta.get('video_name') not in tracked and not meta.get('coarse'):
+                entry = pending.setdefault(source.collection.name, (source, [], []))
+                entry[1].append(uid)
+                entry[2].append(dict(meta, coarse=True))
+
+    count = 0
+    for source, ids, metas in pending.values():
+        for start in range(0, len(ids), 1000):
+            source.collection.update(ids=ids[start:start + 1000], metadatas=metas[start:start + 1000])
+        count += len(ids)
+    return count
+
+
 def process_video(engine, video_path, config, project_name="default_project"):
     """处理视频主流程 (支持动态路径)"""
     # 1. 准备路径
     out_dir = get_output_dir(config, project_name, video_path)
 
-    # 2. 初始化数据库 (传入项目名)
-    db_path = config['project_settings'].get('vector_db_path', 'store/vector_db')
-    db = VectorDB(db_path=db_path, collection_name=project_name)  # <--- 关键修改
+    # 2. 初始化数据库 (传入项目名，开启分片时写入当天/当周的分片)
+    db = open_project_db(config, project_name)
 
     # 配置参数读取
     video_conf = config['video_config']
@@ -108,12 +136,11 @@ def process_video(engine, video_path, config, project_name="default_project"):
 
     print(f" -> 模式: {'[全量/微观]' if is_save_all else '[追踪/宏观]'} | 集合: {project_name}")
 
-    tracker = None
-    if not is_save_all:
-        tracker = SmartTracker(
-            sim_threshold=video_conf['similarity_threshold'],
-            miss_tolerance=video_conf['miss_tolerance']
-        )
+    # 全量模式下也同时追踪，额外写入少量轨迹级数据，供分级检索 (hierarchical) 做粗排
+    tracker = SmartTracker(
+        sim_threshold=video_conf['similarity_threshold'],
+        miss_tolerance=video_conf['miss_tolerance']
+    )
 
     # 3. 读取视频
     cap = cv2.VideoCapture(video_path)
@@ -153,9 +180,9 @@ def process_video(engine, video_path, config, project_name="default_project"):
                         "bbox": str(f["bbox"].tolist())
                     }
                     db.buffer_add(unique_id, f['embedding'], meta)
-            else:
-                # Mode 0: 追踪 (Tracker 内部逻辑会处理多个人脸的分配)
-                tracker.update(current_faces, frame_id, timestamp)
+
+            # 追踪 (Tracker 内部逻辑会处理多个人脸的分配)
+            tracker.update(current_faces, frame_id, timestamp)
 
         frame_id += 1
         if frame_id % 100 == 0:
@@ -165,32 +192,30 @@ def process_video(engine, video_path, config, project_name="default_project"):
     print("")
 
     # 4. 扫尾和保存结果
-    result_content = {}
+    # 宏观轨迹入库 (两种模式都写入)
+    all_tracks = tracker.final_tracks + tracker.active_tracks
+    print(f" -> [Smart] 提取到 {len(all_tracks)} 条人物轨迹")
+
+    for track in all_tracks:
+        unique_id = f"{os.path.basename(video_path)}_track_{id(track)}"
+        meta = {
+            "video_name": os.path.basename(video_path),
+            "data_level": "track",
+            "start_time_ms": track.start_time,
+            "end_time_ms": track.end_time,
+            "frame_id": track.best_frame,
+            "best_score": float(track.best_score),
+            "duration": track.end_time - track.start_time,
+            "bbox": str(track.best_bbox.tolist())
+        }
+        db.buffer_add(unique_id, track.best_embedding, meta)
+
+    db.flush()
+    tracks = tracker.get_results()
 
     if is_save_all:
-        db.flush()
-        result_content = {"info": "Saved Frame-Level Data", "total_faces": db.count()}
+        result_content = {"info": "Saved Frame-Level Data", "total_faces": db.count(), "tracks": tracks}
     else:
-        # Mode 0: 宏观模式入库
-        all_tracks = tracker.final_tracks + tracker.active_tracks
-        print(f" -> [Smart] 提取到 {len(all_tracks)} 条人物轨迹")
-
-        for track in all_tracks:
-            unique_id = f"{os.path.basename(video_path)}_track_{id(track)}"
-            meta = {
-                "video_name": os.path.basename(video_path),
-                "data_level": "track",
-                "start_time_ms": track.start_time,
-                "end_time_ms": track.end_time,
-                "frame_id": track.best_frame,
-                "best_score": float(track.best_score),
-                "duration": track.end_time - track.start_time,
-                "bbox": str(track.best_bbox.tolist())
-            }
-            db.buffer_add(unique_id, track.best_embedding, meta)
-
-        db.flush()
-        tracks = tracker.get_results()
         result_content = {"info": "Saved Track-Level Data", "tracks": tracks}
 
     # 5. 生成报告
@@ -1,46 +1,87 @@
 import argparse
-from service import Searcher
+import client
+from utils import load_config
 
 
-def run_search(image_path, limit, level, threshold, config_path):
+def print_result(i, item):
+    """打印单条结果 (View 层逻辑)"""
+    type_icon = "[VIDEO]" if item['type'] == 'video' else "[IMAGE]"
+    level_tag = item['data_level'].upper()
+
+    print(f"[{i + 1}] {type_icon} {level_tag} | 相似度: {item['score']}")
+    print(f"    - 文件: {item['file_name']}")
+
+    # 使用标准化后的 time_info
+    t = item['time_info']
+    if t['mode'] == 'range':
+        print(f"    - 时段: {t['display']} (Duration: {t['duration_ms']}ms)")
+        print(f"    - 最佳帧: {item['frame_id']}")
+    elif t['mode'] == 'point':
+        print(f"    - 时间: {t['display']}")
+        print(f"    - 帧号: {item['frame_id']}")
+    else:
+        print(f"    - 类型: 静态图片")
+
+    print("-" * 30)
+
+
+def get_searcher(config_path, local=False):
+    """
+    优先使用常驻的 server.py (无需加载模型)，服务未运行时回退到本地 Searcher
+    两者的 search / iter_range 接口一致
+    """
+    if not local:
+        remote = client.connect(load_config(config_path))
+        if remote is not None:
+            print("[Search] 使用运行中的服务 (server.py)")
+            return remote
+
+    from service import Searcher  # 本地模式才加载模型和数据库
+    return Searcher(config_path=config_path)
+
+
+def run_search(image_path, limit, level, threshold, config_path, find_all=False, local=False,
+               since=None, until=None):
     # 1. 初始化服务
-    searcher = Searcher(config_path=config_path)
+    searcher = get_searcher(config_path, local)
 
-    # 2. 一行代码执行搜索
     print(f"[Search] Processing {image_path} ...")
-    results = searcher.search(image_path, limit=limit, level=level, threshold=threshold)
-
-    # 3. 打印结果 (View 层逻辑)
-    print(f"\n=== 搜索结果 (Found: {len(results)}) ===")
 
-    for i, item in enumerate(results):
-        type_icon = "[VIDEO]" if item['type'] == 'video' else "[IMAGE]"
-        level_tag = item['data_level'].upper()
+    if find_all:
+        # 范围检索: 不限数量，边查边打印，低于阈值即停止
+        count = 0
+        items = searcher.iter_range(image_path, threshold=threshold, level=level, since=since, until=until)
+        for i, item in enumerate(items):
+            print_result(i, item)
+            count += 1
+        print(f"\n=== 搜索完成 (Found: {count}) ===")
+        return
 
-        print(f"[{i + 1}] {type_icon} {level_tag} | 相似度: {item['score']}")
-        print(f"    - 文件: {item['file_name']}")
+    # 2. 一行代码执行搜索
+    results = searcher.search(image_path, limit=limit, level=level, threshold=threshold,
+                              since=since, until=until)
 
-        # 使用标准化后的 time_info
-        t = item['time_info']
-        if t['mode'] == 'range':
-            print(f"    - 时段: {t['display']} (Duration: {t['duration_ms']}ms)")
-            print(f"    - 最佳帧: {item['frame_id']}")
-        elif t['mode'] == 'point':
-            print(f"    - 时间: {t['display']}")
-            print(f"    - 帧号: {item['frame_id']}")
-        else:
-            print(f"    - 类型: 静态图片")
+    # 3. 打印结果
+    print(f"\n=== 搜索结果 (Found: {len(results)}) ===")
 
-        print("-" * 30)
+    for i, item in enumerate(results):
+        print_result(i, item)
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", "-i", required=True)
     parser.add_argument("--limit", "-n", type=int, default=5)
-    parser.add_argument("--level", "-l", default="auto")
-    parser.add_argument("--threshold", "-t", type=float, default=0.6)
+    parser.add_argument("--level", "-l", default="auto", choices=["auto", "track", "frame", "hierarchical"])
+    parser.add_argument("--threshold", "-t", type=float, default=0.67)
     parser.add_argument("--config", "-c", default="config.json")
+    parser.add_argument("--all", "-a", action="store_true", help="返回所有高于阈值的结果 (忽略 --limit)")
+    parser.add_argument("--since", help="时间窗口起始日期 YYYYMMDD (开启分片时生效)")
+    parser.add_argument("--until", help="时间窗口结束日期 YYYYMMDD (开启分片时生效)")
+    parser.add_argument("--local", action="store_true", help="不使用运行中的服务，强制在本进程内加载模型")
     args = parser.parse_args()
+    if args.all and args.level == "hierarchical":
+        parser.error("--all 不支持 --level hierarchical")
 
-    run_search(args.input, args.limit, args.level, args.threshold, args.config)
\ No newline at end of file
+    run_search(args.input, args.limit, args.level, args.threshold, args.config, args.all, args.local,
+               args.since, args.until)
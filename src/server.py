@@ -1,12 +1,19 @@
 import cv2
+import json
 import numpy as np
 import uvicorn
+from typing import Optional
 from fastapi import FastAPI, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 from service import Searcher # <--- 核心依赖
+from identity import IdentityIndex
+from utils import load_config
 
 # 全局服务实例
 search_service = None
+# 身份索引缓存 (项目名 -> IdentityIndex)，由离线聚类任务 cluster.py 生成
+identity_indexes = {}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -14,17 +21,25 @@ async def lifespan(app: FastAPI):
     print("[Server] Init Search Service...")
     search_service = Searcher() # 初始化一次，常驻内存
     yield
+    search_service.cache.save()  # 落盘查询缓存
     print("[Server] Shutting down.")
 
 app = FastAPI(lifespan=lifespan)
 
+@app.get("/health")
+def health():
+    # 供命令行客户端探测服务是否在运行
+    return {"status": "ok"}
+
 @app.post("/search")
 def search_face(
         file: UploadFile = File(...),
         limit: int = 5,
         level: str = "auto",
-        threshold: float = 0.6,
-        project: str = "default_project"
+        threshold: float = 0.67,
+        project: str = "default_project",
+        since: Optional[str] = None,
+        until: Optional[str] = None
 ):
     # 1. 读取图片流
     file_bytes = file.file.read()
@@ -37,7 +52,9 @@ def search_face(
         limit=limit,
         level=level,
         threshold=threshold,
-        project=project
+        project=project,
+        since=since,
+        until=until
     )
 
     # 3. 返回 (Service 已经返回了标准化的 dict，直接吐给前端即可)
@@ -47,5 +64,140 @@ def search_face(
         "data": results
     }
 
+@app.post("/search/range")
+def search_face_range(
+        file: UploadFile = File(...),
+        threshold: float = 0.67,
+        level: str = Query("auto", pattern="^(auto|track|frame)$"),
+        project: str = "default_project",
+        page_size: int = Query(100, ge=1, le=1000),
+        cursor: int = Query(0, ge=0),
+        since: Optional[str] = None,
+        until: Optional[str] = None
+):
+    # 1. 读取图片流
+    file_bytes = file.file.read()
+    nparr = np.frombuffer(file_bytes, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    # 2. 范围检索 (分页)，客户端用 next_cursor 继续翻页
+    page = search_service.search_range(
+        img,
+        threshold=threshold,
+        level=level,
+        project=project,
+        page_size=page_size,
+        cursor=cursor,
+        since=since,
+        until=until
+    )
+
+    return {
+        "status": "success",
+        "count": len(page["data"]),
+        "next_cursor": page["next_cursor"],
+        "data": page["data"]
+    }
+
+@app.post("/search/stream")
+def search_face_stream(
+        file: UploadFile = File(...),
+        threshold: float = 0.67,
+        level: str = Query("auto", pattern="^(auto|track|frame)$"),
+        project: str = "default_project",
+        batch_size: int = Query(100, ge=1, le=1000),
+        since: Optional[str] = None,
+        until: Optional[str] = None
+):
+    # 1. 读取图片流
+    file_bytes = file.file.read()
+    nparr = np.frombuffer(file_bytes, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+    # 2. 流式范围检索: 每行一条结果 (NDJSON)，服务端按批翻倍拉取，不必按页重复查询
+    items = search_service.iter_range(
+        img,
+        threshold=threshold,
+        level=level,
+        project=project,
+        batch_size=batch_size,
+        since=since,
+        until=until
+    )
+    lines = (json.dumps(item, ensure_ascii=False) + "\n" for item in items)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "status": "success",
+        "data": search_service.cache.stats()
+    }
+
+def get_identity_index(project):
+    """获取项目的身份索引 (首次加载后常驻内存，离线任务更新后自动重新加载)"""
+    index = identity_indexes.get(project)
+    if index is None:
+        id_cfg = search_service.cfg.get('identity_config', {})
+        index = IdentityIndex(
+            index_dir=id_cfg.get('index_dir', 'store/identity'),
+            project_name=project,
+            threshold=id_cfg.get('threshold', 0.55)
+        )
+        identity_indexes[project] = index
+    else:
+        index.refresh()
+    return index
+
+@app.get("/identities")
+def list_identities(project: str = "default_project"):
+    data = get_identity_index(project).list_identities()
+    return {
+        "status": "success",
+        "count": len(data),
+        "data": data
+    }
+
+@app.get("/identities/{identity_id}")
+def get_identity(identity_id: int, project: str = "default_project"):
+    # 纯索引查找，不做向量检索
+    data = get_identity_index(project).get_appearances(identity_id)
+    return {
+        "status": "success",
+        "identity_id": identity_id,
+        "count": len(data),
+        "data": data
+    }
+
+@app.post("/identities/match")
+def match_identity(
+        file: UploadFile = File(...),
+        project: str = "default_project"
+):
+    # 1. 读取图片流 & 提取特征
+    file_bytes = file.file.read()
+    nparr = np.frombuffer(file_bytes, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    faces = search_service.extract(img)
+    if not faces:
+        return {"status": "success", "identity_id": None, "count": 0, "data": []}
+
+    # 2. 与身份中心比对，命中后直接返回倒排表
+    index = get_identity_index(project)
+    identity_id, sim = index.match(faces[0]['embedding'])
+    data = index.get_appearances(identity_id) if identity_id is not None else []
+    return {
+        "status": "success",
+        "identity_id": identity_id,
+        "similarity": round(sim, 4),
+        "count": len(data),
+        "data": data
+    }
+
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    server_cfg = load_config().get('server', {})
+    if server_cfg.get('uds'):
+        # 本机客户端走 unix socket，省去 TCP 开销
+        uvicorn.run(app, uds=server_cfg['uds'])
+    else:
+        uvicorn.run(app, host=server_cfg.get('host', '0.0.0.0'), port=server_cfg.get('port', 8000))
\ No newline at end of file
@@ -1,8 +1,10 @@
-import cv2
 import os
+from itertools import islice
+from cache import EmbeddingCache
 from core import FaceEngine
 from database import VectorDB
-from utils import load_config, parse_metadata
+from sharding import ShardedDB, ShardRegistry
+from utils import load_config, parse_metadata, distance_to_similarity, similarity_to_distance
 
 
 class Searcher:
@@ -12,42 +14,95 @@ class Searcher:
         :param project_name: 默认连接的项目，也可以在 search 时动态指定
         """
         self.cfg = load_config(config_path)
+        self.search_cfg = self.cfg.get('search_config', {})
 
         # 初始化 AI 引擎
         print(f"[Service] Loading FaceEngine...")
+        self.model_name = self.cfg['model_params']['model_name']
+        self.det_size = tuple(self.cfg['model_params'].get('det_size', (640, 640)))
         self.engine = FaceEngine(
-            model_name=self.cfg['model_params']['model_name'],
+            model_name=self.model_name,
+            det_size=self.det_size,
             # 建议这里把 providers 也做成配置项，目前默认
         )
 
+        # 查询特征缓存 (同一张图重复查询时跳过推理)
+        cache_cfg = self.cfg.get('cache_config', {})
+        self.cache = EmbeddingCache(
+            max_size=cache_cfg.get('max_size', 256),
+            ttl=cache_cfg.get('ttl', 0),
+            path=cache_cfg.get('path'),
+            save_interval=cache_cfg.get('save_interval', 60)
+        )
+
         # 初始化数据库连接 (持有一个客户端实例)
         self.db_path = self.cfg['project_settings'].get('vector_db_path', 'store/vector_db')
         # 预加载默认库，search 时可切换
-        self.default_db = VectorDB(db_path=self.db_path, collection_name=project_name)
+        self.project_name = project_name
+        if self.cfg['project_settings'].get('shard_by'):
+            # 分片模式不使用项目集合，改为缓存各分片的连接
+            self.default_db = None
+            self.shard_registry = ShardRegistry(
+                self.db_path,
+                refresh_interval=self.cfg['project_settings'].get('shard_refresh_interval', 30)
+            )
+        else:
+            self.default_db = VectorDB(db_path=self.db_path, collection_name=project_name)
+            self.shard_registry = None
         print(f"[Service] Ready. DB Path: {self.db_path}")
 
-    def search(self, image_data, limit=5, level="auto", threshold=0.6, project=None):
-        """
-        核心搜索方法
-        :param image_data: 图片路径(str) 或 图片矩阵(numpy array)
-        :param project: 指定搜索的项目集合，None则使用默认
-        :return: 标准化的结果列表
-        """
-        # 1. 图片预处理
-        img = None
+    def _load_image(self, image_data):
+        """图片路径(str) 或 图片矩阵(numpy array) -> 图片矩阵，失败返回 None"""
         if isinstance(image_data, str):
             if not os.path.exists(image_data):
                 print(f"[Error] File not found: {image_data}")
-                return []
-            img = cv2.imread(image_data)
-        else:
-            img = image_data  # 假设是 numpy array
+                return None
+            import cv2
+            return cv2.imread(image_data)
+        return image_data  # 假设是 numpy array
+
+    def _get_db(self, project=None, since=None, until=None):
+        """
+        确定数据库集合，None 则使用默认
+        开启时间分片 (shard_by) 时返回时间窗口内各分片的并行检索视图
+        """
+        if self.shard_registry is not None:
+            return ShardedDB(self.db_path, project or self.project_name, since=since, until=until,
+                             registry=self.shard_registry)
 
+        if project and project != "default_project":
+            # 动态连接其他项目
+            return VectorDB(db_path=self.db_path, collection_name=project)
+        return self.default_db
+
+    def extract(self, image_data):
+        """
+        图片预处理 + 特征提取
+        :param image_data: 图片路径(str) 或 图片矩阵(numpy array)
+        :return: 人脸列表 (同 FaceEngine.extract)，失败返回空列表
+        """
+        img = self._load_image(image_data)
         if img is None:
             return []
 
-        # 2. 提取特征
-        faces = self.engine.extract(img)
+        key = EmbeddingCache.make_key(img, self.model_name, self.det_size)
+        faces = self.cache.get(key)
+        if faces is None:
+            faces = self.engine.extract(img)
+            self.cache.put(key, faces)
+        return faces
+
+    def search(self, image_data, limit=5, level="auto", threshold=0.67, project=None, since=None, until=None):
+        """
+        核心搜索方法
+        :param image_data: 图片路径(str) 或 图片矩阵(numpy array)
+        :param level: auto / track / frame / hierarchical (先查轨迹，再在命中片段内查单帧)
+        :param project: 指定搜索的项目集合，None则使用默认
+        :param since / until: 时间窗口 'YYYYMMDD' (仅开启分片时生效，只检索窗口内的分片)
+        :return: 标准化的结果列表
+        """
+        # 1. 图片预处理 & 提取特征
+        faces = self.extract(image_data)
         if not faces:
             print("[Service] No face detected.")
             return []
@@ -55,21 +110,19 @@ class Searcher:
         # 取最大的人脸进行搜索
         target_emb = faces[0]['embedding']
 
-        # 3. 确定数据库集合
-        db = self.default_db
-        if project and project != "default_project":
-            # 动态连接其他项目
-            db = VectorDB(db_path=self.db_path, collection_name=project)
+        # 2. 确定数据库集合
+        db = self._get_db(project, since, until)
+
+        if level == "hierarchical":
+            return self._search_hierarchical(db, target_emb, limit, threshold)
 
-        # 4. 构造过滤条件
-        where_filter = None
-        if level == "track": where_filter = {"data_level": "track"}
-        if level == "frame": where_filter = {"data_level": "frame"}
+        # 3. 构造过滤条件
+        where_filter = self._level_filter(level)
 
-        # 5. 执行搜索
+        # 4. 执行搜索
         raw_results = db.search(target_emb, limit=limit, where=where_filter)
 
-        # 6. 解析与过滤
+        # 5. 解析与过滤
         parsed_results = []
         for item in raw_results:
             info = parse_metadata(item)
@@ -80,4 +133,150 @@ class Searcher:
 
             parsed_results.append(info)
 
-        return parsed_results
\ No newline at end of file
+        return parsed_results
+
+    @staticmethod
+    def _level_filter(level):
+        """数据层级 -> 过滤条件"""
+        if level == "track": return {"data_level": "track"}
+        if level == "frame": return {"data_level": "frame"}
+        return None
+
+    def search_range(self, image_data, threshold=0.67, level="auto", project=None, page_size=100, cursor=0,
+                     since=None, until=None):
+        """
+        阈值范围检索 (分页): 返回所有相似度不低于 threshold 的结果，不受固定 limit 限制
+        注意: Chroma 不支持 query 偏移，每页都要重新取出并跳过 cursor 之前的结果，
+        单页代价为 O(cursor + page_size)；需要遍历全部结果时优先用 iter_range 流式读取
+        :param level: auto / track / frame (不支持 hierarchical)
+        :param page_size: 每页数量
+        :param cursor: 上一页返回的 next_cursor，首页为 0
+        :return: {"data": 本页结果, "next_cursor": 下一页游标，没有更多结果时为 None}
+        """
+        items = list(islice(
+            self.iter_range(image_data, threshold, level, project, batch_size=page_size, start=cursor,
+                            since=since, until=until),
+            page_size + 1  # 多取一条，用于判断是否还有下一页
+        ))
+
+        has_more = len(items) > page_size
+        return {
+            "data": items[:page_size],
+            "next_cursor": cursor + page_size if has_more else None
+        }
+
+    def iter_range(self, image_data, threshold=0.67, level="auto", project=None, batch_size=100, start=0,
+                   since=None, until=None):
+        """
+        阈值范围检索 (流式): 按相似度从高到低逐条产出结果，低于阈值即停止
+        :param level: auto / track / frame (不支持 hierarchical)
+        :param batch_size: 首批拉取数量，之后每批翻倍
+        :param start: 跳过前 start 条结果 (分页游标)
+        """
+        if level not in ("auto", "track", "frame"):
+            raise ValueError(f"range search does not support level={level!r}")
+
+        faces = self.extract(image_data)
+        if not faces:
+            print("[Service] No face detected.")
+            return
+
+        db = self._get_db(project, since, until)
+        max_distance = similarity_to_distance(threshold)
+        where_filter = self._level_filter(level)
+
+        for item in self._iter_within(db, faces[0]['embedding'], max_distance, where_filter, batch_size, start):
+            yield parse_metadata(item)
+
+    @staticmethod
+    def _iter_within(db, target_emb, max_distance, where, batch_size, start=0):
+        """
+        按距离从近到远产出 max_distance 以内的原始结果
+        Chroma 不支持 query 偏移，这里按批次翻倍扩大 n_results，只产出新增部分，
+        一旦距离超过阈值或数据取尽即提前停止
+        """
+        total = db.count()
+        # 多取一条: 分页时用于判断是否还有下一页，避免为此再发一次翻倍查询
+        fetch = start + batch_size + 1
+        seen = start
+
+        while seen < total:
+            n = min(fetch, total)
+            results = db.search(target_emb, limit=n, where=where)
+
+            for item in results[seen:]:
+                if item['distance'] > max_distance:
+                    return
+                yield item
+
+            # 带过滤条件时实际返回数可能少于 n，说明已取尽
+            if len(results) < n or n >= total:
+                return
+            seen = len(results)
+            fetch *= 2
+
+    def _search_hierarchical(self, db, target_emb, limit, threshold):
+        """
+        两级检索:
+        1. 粗排: 只检索轨迹级 (track) 数据和带 coarse 标记的单帧 (图片等没有轨迹行的数据)，
+           代价取决于轨迹数量而非原始帧数量
+        2. 精排: 仅在接近阈值的候选轨迹对应的视频时间段内检索单帧 (frame) 数据
+        结果按视频去重，每个视频保留得分最高的一条
+        """
+        coarse_limit = self.search_cfg.get('coarse_limit', max(limit * 4, 20))
+        coarse_margin = self.search_cfg.get('coarse_margin', 0.1)
+        margin_ms = self.search_cfg.get('time_margin_ms', 1000)
+
+        # 1. 粗排
+        coarse_results = db.search(
+            target_emb,
+            limit=coarse_limit,
+            where={"$or": [{"data_level": "track"}, {"coarse": True}]}
+        )
+        if not coarse_results:
+            # 没有粗排数据 (本功能之前入库的项目)，退化为单帧检索
+            print("[Service] No track-level data, falling back to frame-level search. "
+                  "Run main.py --mark-coarse or re-ingest to enable hierarchical search.")
+            fine_results = db.search(target_emb, limit=limit * 4, where={"data_level": "frame"})
+            return self._merge_by_video(fine_results, limit, threshold)
+
+        # 2. 只用接近阈值的候选轨迹构造时间窗口，过弱的候选不参与精排
+        windows = []
+        for item in coarse_results:
+            meta = item['meta']
+            if 'start_time_ms' not in meta:
+                continue
+            if distance_to_similarity(item['distance']) < threshold - coarse_margin:
+                continue
+            windows.append({"$and": [
+                {"video_name": meta['video_name']},
+                {"timestamp_ms": {"$gte": meta['start_time_ms'] - margin_ms}},
+                {"timestamp_ms": {"$lte": meta['end_time_ms'] + margin_ms}}
+            ]})
+
+        fine_results = []
+        if windows:
+            window_filter = windows[0] if len(windows) == 1 else {"$or": windows}
+            fine_results = db.search(
+                target_emb,
+                limit=limit * 4,
+                where={"$and": [{"data_level": "frame"}, window_filter]}
+            )
+
+        return self._merge_by_video(coarse_results + fine_results, limit, threshold)
+
+    @staticmethod
+    def _merge_by_video(raw_results, limit, threshold):
+        """解析、阈值过滤并按视频去重"""
+        best_by_video = {}
+        for item in raw_results:
+            info = parse_metadata(item)
+            if info['score'] < threshold:
+                continue
+
+            current = best_by_video.get(info['file_name'])
+            if current is None or info['score'] > current['score']:
+                best_by_video[info['file_name']] = info
+
+        merged = sorted(best_by_video.values(), key=lambda x: x['score'], reverse=True)
+        return merged[:limit]
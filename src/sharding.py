@@ -0,0 +1,242 @@
+import argparse
+import datetime
+import heapq
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from database import VectorDB
+from utils import load_config
+
+# 分片集合命名: {项目名}__{分片键}
+#   按天: default_project__20240105
+#   按周: default_project__2024W01 (ISO 周)
+SHARD_SEP = "__"
+SHARD_KEY_PATTERN = re.compile(r"^\d{8}$|^\d{4}W\d{2}$")
+
+
+def check_project_name(project_name):
+    """分片模式下项目名不能包含分隔符，否则会与其他项目的分片混淆"""
+    if SHARD_SEP in project_name:
+        raise ValueError(f"项目名不能包含 '{SHARD_SEP}' (时间分片模式): {project_name}")
+
+
+def shard_key(date=None, shard_by="day"):
+    """日期 -> 分片键，date 为 None 时取今天 (与 processor.get_output_dir 的日期一致)"""
+    date = date or datetime.date.today()
+    if shard_by == "week":
+        iso_year, iso_week, _ = date.isocalendar()
+        return f"{iso_year}W{iso_week:02d}"
+    return date.strftime("%Y%m%d")
+
+
+def shard_range(key):
+    """分片键 -> 覆盖的日期范围 (起始日, 结束日)"""
+    if "W" in key:
+        iso_year, iso_week = key.split("W")
+        start = datetime.date.fromisocalendar(int(iso_year), int(iso_week), 1)
+        return start, start + datetime.timedelta(days=6)
+    day = datetime.datetime.strptime(key, "%Y%m%d").date()
+    return day, day
+
+
+def parse_date(value):
+    """'YYYYMMDD' 字符串 -> date，None 原样返回"""
+    if value is None or isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value), "%Y%m%d").date()
+
+
+def _collection_names(db_path):
+    """列出数据库中的全部集合名"""
+    import chromadb
+    client = chromadb.PersistentClient(path=db_path)
+    # 新版本返回集合名，旧版本返回 Collection 对象
+    return [c if isinstance(c, str) else c.name for c in client.list_collections()]
+
+
+def list_shards(db_path, project_name, names=None):
+    """
+    列出项目的全部分片: [(分片键, 集合名), ...]，按时间排序
+    :param names: 已列出的集合名 (可选)，不传则从数据库读取
+    """
+    if names is None:
+        names = _collection_names(db_path)
+
+    prefix = project_name + SHARD_SEP
+    shards = []
+    for name in names:
+        # 只认可合法的分片键，避免把 proj__archive 之类的其他集合当成分片
+        key = name[len(prefix):]
+        if name.startswith(prefix) and SHARD_KEY_PATTERN.match(key):
+            shards.append((key, name))
+    return sorted(shards)
+
+
+def open_project_db(config, project_name, date=None):
+    """
+    获取写入用的数据库: 开启分片时返回当天 (当周) 的分片集合，否则返回项目集合
+    """
+    settings = config['project_settings']
+    db_path = settings.get('vector_db_path', 'store/vector_db')
+    shard_by = settings.get('shard_by')
+
+    if not shard_by:
+        return VectorDB(db_path=db_path, collection_name=project_name)
+    check_project_name(project_name)
+    return VectorDB(db_path=db_path, collection_name=project_name + SHARD_SEP + shard_key(date, shard_by))
+
+
+class ShardRegistry:
+    """
+    分片连接缓存 (常驻服务用): 集合名 -> VectorDB 只打开一次，
+    集合列表每隔 refresh_interval 秒刷新一次 (新分片最迟在此间隔后可被检索)
+    """
+
+    def __init__(self, db_path, refresh_interval=30):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._handles = {}
+        self._names = None
+        self._listed_at = 0
+        self._lock = threading.Lock()
+
+    def collection_names(self):
+        """当前集合名列表 (带缓存)"""
+        with self._lock:
+            if self._names is None or time.time() - self._listed_at >= self.refresh_interval:
+                self._names = set(_collection_names(self.db_path))
+                self._listed_at = time.time()
+                # 已被删除的分片 (如数据保留清理) 不再保留连接
+                for name in list(self._handles):
+                    if name not in self._names:
+                        del self._handles[name]
+            return self._names
+
+    def get(self, name):
+        """获取集合连接 (只对已存在的集合调用，不会新建集合)"""
+        with self._lock:
+            db = self._handles.get(name)
+            if db is None:
+                db = VectorDB(db_path=self.db_path, collection_name=name)
+                self._handles[name] = db
+            return db
+
+    def invalidate(self):
+        """强制下次访问时重新列出集合"""
+        with self._lock:
+            self._names = None
+
+
+class ShardedDB:
+    """
+    分片集合的只读视图: 与 VectorDB 接口一致 (search / count / iter_items)，
+    查询并行分发到时间窗口内的各个分片后合并 top-k
+    """
+
+    def __init__(self, db_path, project_name, since=None, until=None, max_workers=8, registry=None):
+        """
+        :param since: 起始日期 'YYYYMMDD' (含)，None 表示不限
+        :param until: 结束日期 'YYYYMMDD' (含)，None 表示不限
+        :param registry: ShardRegistry，常驻服务传入以复用连接；不传则临时打开
+        """
+        check_project_name(project_name)
+        registry = registry or ShardRegistry(db_path)
+        names = registry.collection_names()
+
+        since, until = parse_date(since), parse_date(until)
+        self.shards = []
+        for key, name in list_shards(db_path, project_name, names=names):
+            start, end = shard_range(key)
+            if (since and end < since) or (until and start > until):
+                continue
+            self.shards.append(registry.get(name))
+
+        # 开启分片前写入的数据仍在项目集合中，不限时间窗口时一并检索 (集合不存在时不创建)
+        if since is None and until is None and project_name in names:
+            legacy = registry.get(project_name)
+            if legacy.count() > 0:
+                self.shards.append(legacy)
+
+        self.max_workers = max_workers
+
+    def count(self):
+        return sum(db.count() for db in self.shards)
+
+    def search(self, query_embedding, limit=5, where=None):
+        """并行检索每个分片的 top-k，再按距离合并为全局 top-k"""
+        if not self.shards:
+            return []
+        if len(self.shards) == 1:
+            return self.shards[0].search(query_embedding, limit=limit, where=where)
+
+        if hasattr(query_embedding, 'tolist'):
+            query_embedding = query_embedding.tolist()
+
+        def query_shard(db):
+            # 分片数据量可能少于 limit
+            n = min(limit, db.count())
+            return db.search(query_embedding, limit=n, where=where) if n else []
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.shards))) as pool:
+            shard_results = list(pool.map(query_shard, self.shards))
+
+        return heapq.nsmallest(limit, (item for items in shard_results for item in items), key=lambda x: x['distance'])
+
+    def iter_items(self, where=None, batch_size=1000, include=("embeddings", "metadatas")):
+        """依次遍历每个分片"""
+        for db in self.shards:
+            yield from db.iter_items(where=where, batch_size=batch_size, include=include)
+
+
+def drop_shards_before(db_path, project_name, cutoff, identity_index=None):
+    """
+    数据保留策略: 整片删除结束日期早于 cutoff 的分片 (无需逐条删除)
+    :param cutoff: 'YYYYMMDD' 或 date
+    :param identity_index: 项目的 IdentityIndex，传入时同步清理被删分片的出现记录
+    :return: 删除的集合名列表
+    """
+    import chromadb
+    client = chromadb.PersistentClient(path=db_path)
+
+    cutoff = parse_date(cutoff)
+    dropped = []
+    for key, name in list_shards(db_path, project_name):
+        if shard_range(key)[1] < cutoff:
+            if identity_index is not None:
+                shard = VectorDB(db_path=db_path, collection_name=name)
+                for batch in shard.iter_items(where={"data_level": "track"}, include=()):
+                    identity_index.remove_ids(name, batch['ids'])
+            client.delete_collection(name=name)
+            dropped.append(name)
+
+    if identity_index is not None and dropped:
+        identity_index.save()
+    return dropped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="时间分片管理 (查看 / 按保留天数删除)")
+    parser.add_argument("--project", "-p", default="default_project", help="项目名称")
+    parser.add_argument("--keep-days", type=int, default=0, help="保留最近 N 天的分片，0 表示只查看不删除")
+    parser.add_argument("--config", "-c", default="config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+    db_path = cfg['project_settings'].get('vector_db_path', 'store/vector_db')
+
+    if args.keep_days > 0:
+        from identity import IdentityIndex
+        id_cfg = cfg.get('identity_config', {})
+        index = IdentityIndex(
+            index_dir=id_cfg.get('index_dir', 'store/identity'),
+            project_name=args.project,
+            threshold=id_cfg.get('threshold', 0.55)
+        )
+
+        cutoff = datetime.date.today() - datetime.timedelta(days=args.keep_days - 1)
+        for name in drop_shards_before(db_path, args.project, cutoff, identity_index=index):
+            print(f"[Shard] 已删除: {name}")
+
+    for key, name in list_shards(db_path, args.project):
+        print(f"[Shard] {name} | 数据量: {VectorDB(db_path=db_path, collection_name=name).count()}")
@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import numpy as np
+from database import VectorDB
+from sharding import SHARD_SEP, check_project_name, list_shards
+from utils import load_config
+
+# 导出目录结构:
+#   manifest.json       总数/维度/精度/分块信息
+#   embeddings.npy      连续存放的全部特征向量 (N x D, float32 或 float16)
+#   meta_00000.npz      分块的元数据列 (ids + 每个字段一列 + 字段是否存在的掩码)
+# 开启时间分片的项目按分片分目录导出:
+#   shards.json         项目名 / 分片键列表
+#   {分片键}/           每个分片一份上述结构
+#   legacy/             开启分片前写入项目集合的数据 (如有)
+MANIFEST_NAME = "manifest.json"
+EMBEDDING_NAME = "embeddings.npy"
+SHARDS_NAME = "shards.json"
+LEGACY_DIR = "legacy"
+
+
+def _to_column(values):
+    """
+    一列元数据 -> (numpy 数组, 是否存在掩码)
+    类型按实际取值推断: bool / int64 / float64 / str
+    """
+    present = np.array([v is not None for v in values], dtype=bool)
+    actual = [v for v in values if v is not None]
+
+    if actual and all(isinstance(v, bool) for v in actual):
+        column = np.array([bool(v) if v is not None else False for v in values], dtype=bool)
+    elif actual and all(isinstance(v, int) and not isinstance(v, bool) for v in actual):
+        column = np.array([v if v is not None else 0 for v in values], dtype=np.int64)
+    elif actual and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in actual):
+        column = np.array([v if v is not None else 0.0 for v in values], dtype=np.float64)
+    else:
+        column = np.array([str(v) if v is not None else "" for v in values], dtype=np.str_)
+    return column, present
+
+
+def export_collection(db, out_dir, chunk_size=10000, dtype="float32", shard=None):
+    """
+    分块流式导出集合，内存占用只与 chunk_size 相关
+    :param db: VectorDB 实例
+    :param out_dir: 导出目录
+    :param dtype: 特征向量存储精度 float32 / float16
+    :param shard: 分片键 (记录在 manifest 中)，非分片集合为 None
+    :return: 导出的数据条数
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    total = db.count()
+    emb_path = os.path.join(out_dir, EMBEDDING_NAME)
+
+    embeddings = None
+    dim = 0
+    written = 0
+    chunks = []
+    columns = set()
+
+    for batch in db.iter_items(batch_size=chunk_size):
+        embs = np.asarray(batch['embeddings'], dtype=np.float32)
+        n = len(batch['ids'])
+
+        # 首批确定维度后，预分配连续的磁盘数组
+        if embeddings is None:
+            dim = embs.shape[1]
+            embeddings = np.lib.format.open_memmap(emb_path, mode='w+', dtype=dtype, shape=(total, dim))
+
+        # 导出期间有新数据写入时，只导出开始时的数量
+        n = min(n, total - written)
+        if n <= 0:
+            break
+        embeddings[written:written + n] = embs[:n]
+
+        # 元数据按列存储
+        metas = [m or {} for m in batch['metadatas'][:n]]
+        keys = sorted({k for m in metas for k in m})
+        arrays = {"ids": np.array(batch['ids'][:n], dtype=np.str_)}
+        for k in keys:
+            arrays[f"col__{k}"], arrays[f"mask__{k}"] = _to_column([m.get(k) for m in metas])
+        columns.update(keys)
+
+        chunk_name = f"meta_{len(chunks):05d}.npz"
+        np.savez(os.path.join(out_dir, chunk_name), **arrays)
+        chunks.append({"file": chunk_name, "start": written, "count": n})
+
+        written += n
+        print(f" -> 已导出: {written}/{total}", end="\r")
+
+    if embeddings is not None:
+        embeddings.flush()
+        del embeddings
+    print("")
+
+    manifest = {
+        "collection": db.collection.name,
+        "shard": shard,
+        "count": written,
+        "dim": int(dim),
+        "dtype": dtype,
+        "columns": sorted(columns),
+        "chunks": chunks
+    }
+    with open(os.path.join(out_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    return written
+
+
+def import_collection(db, in_dir, batch_size=5000):
+    """
+    从导出目录批量导入集合 (按块读取，内存占用只与块大小相关)
+    :param db: 目标 VectorDB 实例
+    :param in_dir: export_collection 生成的目录
+    :param batch_size: 每次提交给数据库的数量
+    :return: 导入的数据条数
+    """
+    with open(os.path.join(in_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if not manifest['count']:
+        return 0
+
+    embeddings = np.load(os.path.join(in_dir, EMBEDDING_NAME), mmap_mode='r')
+    imported = 0
+
+    for chunk in manifest['chunks']:
+        data = np.load(os.path.join(in_dir, chunk['file']))
+        ids = data['ids'].tolist()
+        keys = [name[len("col__"):] for name in data.files if name.startswith("col__")]
+
+        # 列 -> 行
+        metas = [{} for _ in ids]
+        for k in keys:
+            values = data[f"col__{k}"].tolist()
+            present = data[f"mask__{k}"]
+            for i, v in enumerate(values):
+                if present[i]:
+                    metas[i][k] = v
+
+        start = chunk['start']
+        for offset in range(0, len(ids), batch_size):
+            end = min(offset + batch_size, len(ids))
+            embs = np.asarray(embeddings[start + offset:start + end], dtype=np.float32)
+            db.bulk_upsert(ids[offset:end], embs.tolist(), metas[offset:end])
+
+        imported += len(ids)
+        print(f" -> 已导入: {imported}/{manifest['count']}", end="\r")
+
+    print("")
+    return imported
+
+
+def export_project(config, project_name, out_dir, chunk_size=10000, dtype="float32"):
+    """
+    导出整个项目: 未开启分片时导出项目集合，开启分片时逐个分片导出
+    :return: 导出的数据条数
+    """
+    settings = config['project_settings']
+    db_path = settings.get('vector_db_path', 'store/vector_db')
+
+    if not settings.get('shard_by'):
+        db = VectorDB(db_path=db_path, collection_name=project_name)
+        return export_collection(db, out_dir, chunk_size=chunk_size, dtype=dtype)
+
+    check_project_name(project_name)
+    total = 0
+    keys = []
+    for key, name in list_shards(db_path, project_name):
+        db = VectorDB(db_path=db_path, collection_name=name)
+        print(f"[Export] 分片: {name}")
+        total += export_collection(db, os.path.join(out_dir, key), chunk_size=chunk_size, dtype=dtype, shard=key)
+        keys.append(key)
+
+    legacy = VectorDB(db_path=db_path, collection_name=project_name)
+    has_legacy = legacy.count() > 0
+    if has_legacy:
+        print(f"[Export] 未分片数据: {project_name}")
+        total += export_collection(legacy, os.path.join(out_dir, LEGACY_DIR), chunk_size=chunk_size, dtype=dtype)
+
+    with open(os.path.join(out_dir, SHARDS_NAME), 'w', encoding='utf-8') as f:
+        json.dump({"project": project_name, "shards": keys, "legacy": has_legacy}, f, indent=2, ensure_ascii=False)
+
+    return total
+
+
+def import_project(config, project_name, in_dir, batch_size=5000):
+    """
+    导入整个项目，分片结构必须与当前配置一致 (否则数据会写入检索不到的集合)
+    :return: 导入的数据条数
+    """
+    settings = config['project_settings']
+    db_path = settings.get('vector_db_path', 'store/vector_db')
+    shards_path = os.path.join(in_dir, SHARDS_NAME)
+    is_sharded_export = os.path.exists(shards_path)
+
+    if is_sharded_export and not settings.get('shard_by'):
+        raise ValueError(f"{in_dir} 是按时间分片导出的，请先在配置中开启 project_settings.shard_by 再导入")
+    if not is_sharded_export and settings.get('shard_by'):
+        raise ValueError(f"{in_dir} 是未分片的导出，当前配置开启了 shard_by，导入后将无法按时间窗口检索；"
+                         f"请关闭 shard_by 后导入")
+
+    if not is_sharded_export:
+        db = VectorDB(db_path=db_path, collection_name=project_name)
+        return import_collection(db, in_dir, batch_size=batch_size)
+
+    check_project_name(project_name)
+    with open(shards_path, 'r', encoding='utf-8') as f:
+        layout = json.load(f)
+
+    total = 0
+    for key in layout['shards']:
+        db = VectorDB(db_path=db_path, collection_name=project_name + SHARD_SEP + key)
+        print(f"[Import] 分片: {db.collection.name}")
+        total += import_collection(db, os.path.join(in_dir, key), batch_size=batch_size)
+
+    if layout.get('legacy'):
+        db = VectorDB(db_path=db_path, collection_name=project_name)
+        print(f"[Import] 未分片数据: {project_name}")
+        total += import_collection(db, os.path.join(in_dir, LEGACY_DIR), batch_size=batch_size)
+
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="项目集合导出/导入 (列式格式)")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("--project", "-p", default="default_project", help="项目名称")
+    parser.add_argument("--path", "-d", required=True, help="导出目录 / 导入来源目录")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"], help="导出时特征向量精度")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="每块数据量")
+    parser.add_argument("--config", "-c", default="config.json", help="配置文件路径")
+    args = parser.parse_args()
+
+    cfg = load_config(args.config)
+
+    if args.action == "export":
+        count = export_project(cfg, args.project, args.path, chunk_size=args.chunk_size, dtype=args.dtype)
+        print(f"[Export] {args.project} -> {args.path} | 共 {count} 条")
+    else:
+        count = import_project(cfg, args.project, args.path, batch_size=args.chunk_size)
+        print(f"[Import] {args.path} -> {args.project} | 共 {count} 条")
@@ -15,6 +15,19 @@ def l2_normalize(x):
     return x / np.linalg.norm(x)
 
 
+def distance_to_similarity(distance):
+    """
+    数据库距离 -> 余弦相似度
+    向量均已归一化，Chroma 的 l2 距离为平方欧氏距离: d = 2 - 2cos
+    """
+    return 1 - distance / 2
+
+
+def similarity_to_distance(similarity):
+    """余弦相似度 -> 数据库距离 (distance_to_similarity 的逆运算)"""
+    return 2 * (1 - similarity)
+
+
 def load_config(config_path="config.json"):
     """
     统一加载配置文件，支持从 src 目录或根目录运行
@@ -41,7 +54,8 @@ def parse_metadata(item_data):
     """
     meta = item_data.get('meta', {})
     distance = item_data.get('distance', 0.0)
-    score = 1 / (1 + distance)
+    # 与 tracker 使用同一尺度 (余弦相似度)
+    score = distance_to_similarity(distance)
 
     file_name = meta.get('video_name', 'Unknown')
     is_video = file_name.lower().endswith(('.mp4', '.avi', '.mov', '.mkv'))
@@ -1,14 +1,14 @@
 import argparse
 import cv2
 import os
-from service import Searcher
+from search import get_searcher
 
 
-def visualize(image_path, limit, level, threshold, output_dir):
+def visualize(image_path, limit, level, threshold, output_dir, local=False):
     # 1. 调用 Service
     print(f"[Visual] Searching for: {image_path} (Threshold: {threshold})")
-    searcher = Searcher()
-    # 这里的 searcher 会自动加载 config.json
+    # 优先转发给运行中的 server.py，否则本地加载 (自动读取 config.json)
+    searcher = get_searcher("config.json", local)
     results = searcher.search(image_path, limit=limit, level=level, threshold=threshold)
 
     if not results:
@@ -59,9 +59,10 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--input", "-i", required=True, help="Input image path")
     parser.add_argument("--limit", "-n", type=int, default=3, help="Max results")
-    parser.add_argument("--level", "-l", default="auto", choices=["auto", "track", "frame"])
-    parser.add_argument("--threshold", "-t", type=float, default=0.6, help="Similarity threshold")
+    parser.add_argument("--level", "-l", default="auto", choices=["auto", "track", "frame", "hierarchical"])
+    parser.add_argument("--threshold", "-t", type=float, default=0.67, help="Similarity threshold")
     parser.add_argument("--output", "-o", default="store/visualized", help="Output directory for result images")
+    parser.add_argument("--local", action="store_true", help="Do not use a running server.py")
 
     args = parser.parse_args()
 
@@ -71,5 +72,6 @@ if __name__ == "__main__":
         limit=args.limit,
         level=args.level,
         threshold=args.threshold,
-        output_dir=args.output
+        output_dir=args.output,
+        local=args.local
     )
\ No newline at end of file